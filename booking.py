@@ -1,21 +1,31 @@
+import asyncio
+import atexit
 import logging
 import os
+import queue
 import random
 import re
+import sys
 import time
 from datetime import datetime, timedelta
+from functools import cached_property
+from logging.handlers import QueueHandler, QueueListener
 
-from playwright.sync_api import sync_playwright
+from playwright.async_api import async_playwright
 
-# 配置日志记录，保存到 booking.log 文件中
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('booking.log', mode='w', encoding='utf-8'),
-        logging.StreamHandler()
-    ]
-)
+# 配置日志记录，保存到 booking.log 文件中。
+# 关键路径上的 logging 调用只往内存队列里放一条记录，
+# 真正的 write()+flush() 由后台 QueueListener 线程完成，不阻塞抢票点击序列
+_log_queue = queue.Queue(-1)
+_log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+_file_handler = logging.FileHandler('booking.log', mode='w', encoding='utf-8')
+_file_handler.setFormatter(_log_formatter)
+_stream_handler = logging.StreamHandler()
+_stream_handler.setFormatter(_log_formatter)
+logging.basicConfig(level=logging.INFO, handlers=[QueueHandler(_log_queue)])
+_log_listener = QueueListener(_log_queue, _file_handler, _stream_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 
 class LightningFastBooking:
     def __init__(self):
@@ -35,55 +45,125 @@ class LightningFastBooking:
         self.target_time = "08:30:00:000"
         self.is_ci = os.getenv('GITHUB_ACTIONS') == 'true'
 
-    def random_delay(self, profile='normal'):
+        # 选择器字符串和正则只在这里构建/编译一次，后续全部查表
+        self._venue_sel = f'text="{self.venue_name}"'
+        self._court_sel = {c: [f'uni-text:has-text("{c}")', f'text={c}'] for c in self.courts}
+        self._slot_parts = {
+            slot: (slot.split('-')[0], slot.split('-')[1], slot.split('-')[0].split(':')[0])
+            for slot in self.time_slots
+        }
+        self._time_regex = {
+            slot: re.compile(f"{start_hour}:00 - {end}.*￥")
+            for slot, (start, end, start_hour) in self._slot_parts.items()
+        }
+        self._success_re = re.compile("预约成功|提交成功")
+        self._failure_re = re.compile("失败|错误|超限|频繁|取消.*次|已达上限")
+
+    async def random_delay(self, profile='normal'):
         """分级延迟：'normal'用于准备阶段，'fast'用于抢票的 crítico 阶段。"""
         if self.is_ci:
-            time.sleep(0.2)
+            await asyncio.sleep(0.2)
             return
 
         if profile == 'fast':
             min_sec, max_sec = 0.1, 0.3
         else: # 'normal'
             min_sec, max_sec = 0.5, 1.2
-        
-        delay = random.uniform(min_sec, max_sec)
-        time.sleep(delay)
 
-    def wait_until_target_time(self):
-        """等待到目标时间才开始执行（精确到毫秒）"""
-        if self.is_ci:
-            logging.info("CI环境，直接执行预约...")
-            return
-            
-        now = datetime.now()
-        time_parts = self.target_time.split(':')
+        # 内联 uniform：random.random() 一次调用即可，省掉 uniform 的分发开销
+        delay = min_sec + (max_sec - min_sec) * random.random()
+        await asyncio.sleep(delay)
+
+    @cached_property
+    def _target_parts(self):
+        """目标时间 "HH:MM:SS:mmm" 解析一次后缓存为 (时, 分, 秒, 毫秒)"""
+        hour, minute, second, millisecond = self.target_time.split(':')
+        return int(hour), int(minute), int(second), int(millisecond)
+
+    def _next_target(self, now):
+        """下一个目标时刻：今天的目标时间已过则顺延到明天"""
+        hour, minute, second, millisecond = self._target_parts
         target = now.replace(
-            hour=int(time_parts[0]), 
-            minute=int(time_parts[1]), 
-            second=int(time_parts[2]), 
-            microsecond=int(time_parts[3]) * 1000
+            hour=hour,
+            minute=minute,
+            second=second,
+            microsecond=millisecond * 1000
         )
-        
         if now >= target:
             target += timedelta(days=1)
-        
+        return target
+
+    async def wait_until_target_time(self):
+        """等待到目标时间才开始执行（精确到毫秒）"""
+        now = datetime.now()
+        # 这里已经拿到当前时间，顺手算好明天的日期正则，
+        # 一个正则一次浏览器内扫描即可命中 "明天"/"-05" 任一日期标签
+        self._tomorrow_day = (now + timedelta(days=1)).day
+        self._date_regex = re.compile(rf"明天|-{self._tomorrow_day:02d}|{self._tomorrow_day:02d}")
+
+        if self.is_ci:
+            logging.info("CI环境，直接执行预约...")
+            return
+
+        target = self._next_target(now)
+
         logging.info(f"准备工作完成，等待目标时间: {target.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}")
-        
-        while datetime.now() < target:
-            time.sleep(0.001) # 毫秒级自旋等待
-        
+
+        # 先异步睡到目标前 20ms（期间事件循环继续处理 CDP 消息），
+        # 只在最后 20ms 用 perf_counter_ns 自旋
+        target_ts = target.timestamp()
+        await asyncio.sleep(max(0, target_ts - time.time() - 0.02))
+        target_ns = time.perf_counter_ns() + int((target_ts - time.time()) * 1e9)
+        while time.perf_counter_ns() < target_ns:
+            pass
+
         logging.info("⏰ 时间到！开始执行抢票...")
 
-    def wait_and_click(self, page, selector_list, timeout=5000):
+    # 对抢票脚本纯属开销的资源类型和统计域名，在 context 层直接拦掉
+    _BLOCKED_RESOURCE_TYPES = ("image", "font", "media")
+    _BLOCKED_HOSTS = ("google-analytics.com", "googletagmanager.com", "hm.baidu.com", "cnzz.com")
+
+    async def _block_heavy_resources(self, route):
+        """拦截图片/字体/媒体与统计脚本，减少 Phase 1 的传输与渲染开销。
+
+        样式表保留：可见性检查依赖布局信息。
+        """
+        request = route.request
+        if request.resource_type in self._BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+        elif any(host in request.url for host in self._BLOCKED_HOSTS):
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def wait_and_click(self, page, selector_list, timeout=5000):
+        """准备阶段的容错点击：带滚动和拟人延迟。
+
+        抢票热路径不走这里——那边由 _cdp_click 和 _LOCK_COMBO_JS 在浏览器内完成。
+        """
+        # 先把候选选择器并成一个联合 Locator，一次浏览器内匹配只付一次超时；
+        # 列表里混有 text= 引擎选择器，不能用 "," 联合 CSS，因此用 or_ 组合
+        try:
+            union = page.locator(selector_list[0])
+            for selector in selector_list[1:]:
+                union = union.or_(page.locator(selector))
+            element = union.first
+            await element.wait_for(state='visible', timeout=timeout)
+            await element.scroll_into_view_if_needed()
+            await self.random_delay('normal')
+            await element.click()
+            logging.info(f"成功点击联合选择器: {selector_list}")
+            return True
+        except Exception:
+            logging.warning(f"联合选择器未命中，退回逐个尝试: {selector_list}")
+
         for selector in selector_list:
             try:
                 element = page.locator(selector).first
-                element.wait_for(state='visible', timeout=timeout)
-                element.scroll_into_view_if_needed()
-                # 在关键的抢票阶段使用快速延迟
-                delay_profile = 'fast' if page.url.endswith('booking') else 'normal'
-                self.random_delay(delay_profile)
-                element.click()
+                await element.wait_for(state='visible', timeout=timeout)
+                await element.scroll_into_view_if_needed()
+                await self.random_delay('normal')
+                await element.click()
                 logging.info(f"成功点击元素: {selector}")
                 return True
             except Exception:
@@ -92,169 +172,435 @@ class LightningFastBooking:
         logging.error(f"所有选择器均无法点击: {selector_list}")
         return False
 
-    def do_login(self, page):
+    # 登录态持久化文件；12小时内的状态视为仍然有效
+    _STATE_PATH = "state.json"
+    _STATE_MAX_AGE = 12 * 3600
+
+    def _saved_state_path(self):
+        """若存在且足够新的登录态文件，返回其路径供 new_context 复用，否则返回 None"""
+        try:
+            if time.time() - os.path.getmtime(self._STATE_PATH) < self._STATE_MAX_AGE:
+                logging.info(f"发现可复用的登录态: {self._STATE_PATH}")
+                return self._STATE_PATH
+        except OSError:
+            pass
+        return None
+
+    async def _is_logged_in(self, page):
+        """通过场馆列表是否可见探测当前是否已处于登录态"""
+        try:
+            await page.locator(self._venue_sel).wait_for(state='visible', timeout=3000)
+            return True
+        except Exception:
+            return False
+
+    async def do_login(self, page):
         logging.info("处理登录...")
-        if not self.wait_and_click(page, ['text="校外人员登录"']):
+        if not await self.wait_and_click(page, ['text="校外人员登录"']):
              raise Exception("点击'校外人员登录'失败")
-        
+
         if self.username and self.password:
-            page.locator('input[type="text"]').fill(self.username)
-            page.locator('input[type="password"]').fill(self.password)
-            self.random_delay('normal')
+            # fill 依赖焦点再经 Input.insertText 注入文本，并发执行会在协议层交错、
+            # 把文本打进错误的输入框，必须串行
+            await page.locator('input[type="text"]').fill(self.username)
+            await page.locator('input[type="password"]').fill(self.password)
+            await self.random_delay('normal')
             logging.info("已填写登录信息")
-            
-            if not self.wait_and_click(page, ['uni-button:has-text("立即登录")']):
+
+            if not await self.wait_and_click(page, ['uni-button:has-text("立即登录")']):
                  raise Exception("点击'立即登录'按钮失败")
             logging.info("登录成功")
         else:
             logging.warning("未设置用户名或密码，跳过登录步骤")
-        
-        page.wait_for_load_state('networkidle', timeout=10000)
 
-    def _login_and_prepare(self, page):
+        # uni-app 页面有轮询请求，networkidle 永远等不到只会烧满超时；
+        # 改为等待登录后必然出现的场馆列表元素
+        await page.locator(self._venue_sel).wait_for(state='visible', timeout=10000)
+
+    async def _login_and_prepare(self, page):
         """第一阶段：在关键时间前完成登录，并导航至可预订页面"""
         logging.info("--- Phase 1: Pre-login and Preparation ---")
         logging.info("打开场地预约主页...")
-        page.goto("http://cgzx.scu.edu.cn/venue/", wait_until="domcontentloaded")
-        
-        self.do_login(page)
+        await page.goto("http://cgzx.scu.edu.cn/venue/", wait_until="domcontentloaded")
+
+        # 没有加载过保存的登录态就别探测了——探测失败要白等满 3 秒，
+        # 每日定时运行时状态文件早已过期，直接登录才是主路径
+        if getattr(self, '_state_loaded', False) and await self._is_logged_in(page):
+            logging.info("复用已保存的登录态，跳过登录步骤")
+        else:
+            await self.do_login(page)
+            await page.context.storage_state(path=self._STATE_PATH)
+            logging.info(f"登录态已保存至 {self._STATE_PATH}")
 
         logging.info(f"选择场馆: {self.venue_name}")
-        if not self.wait_and_click(page, [f'text="{self.venue_name}"']):
+        if not await self.wait_and_click(page, [self._venue_sel]):
             raise Exception(f"选择场馆 '{self.venue_name}' 失败")
 
-        self.random_delay('normal')
+        await self.random_delay('normal')
 
         booking_selectors = ['uni-button:has-text("场馆预约")', 'text=场馆预约', 'uni-button']
         logging.info(f"点击场馆预约按钮...")
-        if not self.wait_and_click(page, booking_selectors):
+        if not await self.wait_and_click(page, booking_selectors):
             raise Exception("点击'场馆预约'按钮失败")
-        
+
+        await self._prepare_court_pages(page)
+        await self._warmup_renderer()
         logging.info("--- Phase 1 Complete: Logged in and on the booking page. ---")
 
-    def _execute_booking(self, page):
-        """第二阶段：执行时间敏感的预订操作，遍历所有场地和时间组合"""
-        logging.info("--- Phase 2: Critical Booking Execution ---")
-        
-        # 1. 选择日期 (只需一次)
-        logging.info("选择明天日期...")
-        tomorrow = (datetime.now() + timedelta(days=1)).day
-        date_selectors = [f'text=明天', f'text=/-{tomorrow:02d}/', f'text=/{tomorrow:02d}/']
-        if not self.wait_and_click(page, date_selectors):
-            raise Exception("选择明天日期失败")
-        self.random_delay('fast')
-
-        # 2. 创建并随机化所有场地和时间段的组合
-        all_combinations = [(court, slot) for court in self.courts for slot in self.time_slots]
-        random.shuffle(all_combinations)
-        logging.info(f"将按随机顺序尝试 {len(all_combinations)} 种预订组合: {all_combinations}")
-
-        # 3. 遍历所有组合进行尝试
-        for court, time_slot in all_combinations:
+    async def _warmup_renderer(self):
+        """在空闲的准备窗口预热每个页签：触发一次真实交互和批量查询，
+        让 V8 提前 JIT 热路径的事件处理器和选择器查询，而不是在 08:30 现场编译"""
+
+        async def warmup_one(court, pg):
             try:
-                logging.info(f"--- 正在尝试组合: 场地[{court}], 时间[{time_slot}] ---")
-                
-                # a. 选择场地 (切换tab)
-                court_selectors = [f'uni-text:has-text("{court}")', f'text={court}']
-                if not self.wait_and_click(page, court_selectors, timeout=1500):
-                    logging.warning(f"无法点击场地 '{court}' 的tab，跳过此组合。")
-                    continue
-                self.random_delay('fast')
-
-                # b. 选择时间段
-                end_time = time_slot.split('-')[1]
-                start_hour_text = time_slot.split('-')[0].split(':')[0]
-                time_regex = re.compile(f"{start_hour_text}:00 - {end_time}.*￥")
-                
-                page.get_by_text(time_regex).first.click(timeout=1000)
-                self.random_delay('fast')
-
-                # c. 点击 '确定' 并验证
-                page.locator('uni-button:has-text("确定")').first.click(timeout=1000)
-                page.locator('uni-button:has-text("提交订单")').first.wait_for(state='visible', timeout=2000)
-                
-                logging.info(f"✅ 成功锁定组合: 场地[{court}], 时间[{time_slot}]。")
-                
-                # d. 提交最终订单
-                if not self.wait_and_click(page, ['uni-button:has-text("提交订单")']):
-                    logging.warning("锁定后提交失败，可能被抢占。尝试下一个组合...")
+                loc = self._locators[court]['court']
+                await loc.hover(timeout=2000)
+                await loc.click(timeout=2000)
+                await pg.evaluate("() => { for (let i = 0; i < 1000; i++) document.querySelectorAll('uni-button'); }")
+                await pg.wait_for_timeout(50)
+            except Exception as e:
+                logging.warning(f"场地 '{court}' 页签预热失败: {str(e).split(chr(10))[0]}")
+
+        await asyncio.gather(*(warmup_one(court, pg) for court, pg in self._pages.items()))
+
+    # 在浏览器内一次完成「点时间段 → 点确定 → 等提交订单 → 点提交」，
+    # 把原来 4 次以上的协议往返压成 1 次 evaluate
+    _LOCK_COMBO_JS = """
+    async ({ timePattern }) => {
+        // 与 Playwright 的 get_by_text 一致：把连续空白折叠成单个空格再匹配，
+        // 否则时间和价格之间的换行会让 .* 永远匹配不上
+        const norm = (t) => (t || '').replace(/\\s+/g, ' ');
+        const deepestMatch = (re) => {
+            const hits = [...document.querySelectorAll('*')].filter(e => re.test(norm(e.textContent)));
+            return hits.find(e => ![...e.children].some(c => re.test(norm(c.textContent)))) || hits.pop() || null;
+        };
+        const findButton = (text) =>
+            [...document.querySelectorAll('uni-button')].find(b => (b.textContent || '').includes(text));
+
+        const slot = deepestMatch(new RegExp(timePattern));
+        if (!slot) return { ok: false, step: 'time' };
+        slot.click();
+
+        const confirm = findButton('确定');
+        if (!confirm) return { ok: false, step: 'confirm' };
+        confirm.click();
+
+        const deadline = Date.now() + 2000;
+        let submit = null;
+        while (Date.now() < deadline && !(submit = findButton('提交订单'))) {
+            await new Promise(r => setTimeout(r, 25));
+        }
+        if (!submit) return { ok: false, step: 'submit' };
+        submit.click();
+        return { ok: true };
+    }
+    """
+
+    async def _cdp_click(self, locator, cdp, timeout=1000):
+        """通过 CDP 直接派发鼠标事件，跳过 Playwright 的 actionability 检查链。
+
+        元素几何信息仍由 Playwright 解析（uni-app 的 has-text 选择器无法直接喂给
+        DOM.querySelector），但点击本身走原生 Input.dispatchMouseEvent，省掉
+        auto-wait/hover/可见性复查的多次往返。拿不到坐标时回退到普通 click。
+        """
+        box = await locator.bounding_box(timeout=timeout)
+        if box is None:
+            await locator.click(timeout=timeout)
+            return
+        x = box['x'] + box['width'] / 2
+        y = box['y'] + box['height'] / 2
+        for event_type in ('mousePressed', 'mouseReleased'):
+            await cdp.send('Input.dispatchMouseEvent', {
+                'type': event_type,
+                'x': x,
+                'y': y,
+                'button': 'left',
+                'clickCount': 1,
+            })
+
+    async def _prepare_court_pages(self, page):
+        """为每个场地预开一个已就位的页签，抢票时不再串行切换场地tab。
+
+        所有页签共享同一 context 的登录态；每个页签在 Phase 1 就预先点好
+        自己的场地 tab，并在其上构建 Locator 缓存与 CDP 会话。
+        额外页签的打开、导航和预选并发进行。
+        """
+        context = page.context
+        booking_url = page.url
+        self._pages = {self.courts[0]: page}
+        self._locators = {}
+
+        async def open_and_position(court, pg=None):
+            if pg is None:
+                pg = await context.new_page()
+                await pg.goto(booking_url, wait_until="domcontentloaded")
+                self._pages[court] = pg
+            try:
+                await pg.locator(self._court_sel[court][0]).first.click(timeout=3000)
+            except Exception:
+                logging.warning(f"预选场地tab '{court}' 失败，将在抢票阶段重试。")
+            await self._build_locator_cache(pg, court)
+
+        await asyncio.gather(
+            open_and_position(self.courts[0], page),
+            *(open_and_position(court) for court in self.courts[1:]),
+        )
+
+    async def _close_court_pages(self, main_page):
+        """回收预开的场地页签和 CDP 会话，供重走 Phase 1 前调用。
+
+        长驻模式下每次重新登录都会重建 self._pages/_locators，
+        不先关掉旧页签就会每次泄漏标签页和会话。
+        """
+        for locs in getattr(self, '_locators', {}).values():
+            try:
+                await locs['cdp'].detach()
+            except Exception:
+                pass
+        for pg in getattr(self, '_pages', {}).values():
+            if pg is not main_page:
+                try:
+                    await pg.close()
+                except Exception:
+                    pass
+        self._pages = {}
+        self._locators = {}
+
+    async def _build_locator_cache(self, page, court):
+        """预编译某场地页签的 Locator 和 CDP 会话，热循环中只做字典查找。
+
+        时段/确定/提交的定位与点击已整体下沉到 _LOCK_COMBO_JS 在浏览器内完成，
+        这里只需缓存场地 tab 的 Locator。
+        """
+        self._locators[court] = {
+            'court': page.locator(self._court_sel[court][0]).first,
+            'cdp': await page.context.new_cdp_session(page),
+        }
+
+    async def _execute_booking(self, page):
+        """第二阶段：执行时间敏感的预订操作，各场地页签并发尝试各自的时间段。
+
+        每个场地一个协程驱动自己的页签，尾延迟从 sum(单次尝试) 降到
+        max(单次尝试)；第一个提交成功的场地通过 asyncio.Event 叫停其余场地。
+        """
+        logging.info("--- Phase 2: Critical Booking Execution ---")
+
+        # 1. 每个场地按（CI 下确定性的）顺序尝试自己的时间段
+        if self.is_ci:
+            slot_order = {court: list(self.time_slots) for court in self.courts}
+        else:
+            slot_order = {court: random.sample(self.time_slots, len(self.time_slots))
+                          for court in self.courts}
+        logging.info(f"各场地并发尝试时段: {slot_order}")
+
+        stop = asyncio.Event()
+
+        async def try_court(court):
+            """在该场地自己的页签上依次尝试其时间段，锁定即叫停其它场地"""
+            pg = self._pages.get(court, page)
+            locs = self._locators[court]
+            dated = False
+            for time_slot in slot_order[court]:
+                if stop.is_set():
+                    return None
+                try:
+                    logging.debug(f"--- 正在尝试组合: 场地[{court}], 时间[{time_slot}] ---")
+
+                    # a. 页签首次使用时选择明天日期（单正则一次扫描）
+                    if not dated:
+                        await pg.get_by_text(self._date_regex).first.click(timeout=1500)
+                        dated = True
+
+                    # b. 场地tab已在 Phase 1 预选，再补点一次兜底
+                    await self._cdp_click(locs['court'], locs['cdp'], timeout=1500)
+
+                    # c. 浏览器内一次性完成 选时段→确定→提交订单。
+                    # 提交动作在 evaluate 内部发生，这里在进入前最后检查一次 stop，
+                    # 并在成功后立刻 set——两个 evaluate 同时在途时仍有极小的
+                    # 重复下单窗口，由服务端的"每人一单"限制兜底
+                    if stop.is_set():
+                        return None
+                    result = await pg.evaluate(
+                        self._LOCK_COMBO_JS,
+                        {'timePattern': self._time_regex[time_slot].pattern},
+                    )
+                    if not result.get('ok'):
+                        logging.warning(
+                            f"组合 [{court} / {time_slot}] 在步骤[{result.get('step')}]失败，尝试下一个...")
+                        continue
+
+                    stop.set()
+                    logging.info(f"✅ 成功锁定并提交组合: 场地[{court}], 时间[{time_slot}]。")
+
+                    # d. 检查结果
+                    success = await self.check_result(pg)
+                    return (pg, success)
+
+                except Exception as e:
+                    error_summary = str(e).split('\n')[0]
+                    logging.warning(f"组合 [{court} / {time_slot}] 尝试失败: {error_summary}. 尝试下一个...")
                     continue
+            return None
 
-                # e. 检查结果并支付
-                success = self.check_result(page)
-                if success:
-                    self.go_to_payment(page)
-                
-                return success
+        # 2. 并发驱动所有场地页签。重复下单的竞态下可能同时出现失败和成功的
+        # 结果，必须优先取成功的那个去支付，不能见到第一个结果就返回
+        outcomes = [o for o in await asyncio.gather(*(try_court(court) for court in self.courts)) if o]
+        if not outcomes:
+            raise Exception("已尝试所有场地和时间组合，未能成功预订。")
 
-            except Exception as e:
-                error_summary = str(e).split('\n')[0]
-                logging.warning(f"组合 [{court} / {time_slot}] 尝试失败: {error_summary}. 尝试下一个...")
-                continue
-        
-        raise Exception("已尝试所有场地和时间组合，未能成功预订。")
+        for pg, success in outcomes:
+            if success:
+                await self.go_to_payment(pg)
+                return True
+        return False
+
+    # 用 MutationObserver 同时竞速成功/失败文案：谁先出现就立刻返回，
+    # 不再是「等成功 4s 超时后再等失败 1s」的串行叠加
+    _RESULT_RACE_JS = """
+    async ({ successPattern, failurePattern, timeoutMs }) => {
+        const successRe = new RegExp(successPattern);
+        const failureRe = new RegExp(failurePattern);
+        const check = () => {
+            const text = document.body.innerText || '';
+            const s = text.match(successRe);
+            if (s) return { status: 'success', text: s[0] };
+            const f = text.match(failureRe);
+            if (f) return { status: 'fail', text: f[0] };
+            return null;
+        };
+        const immediate = check();
+        if (immediate) return immediate;
+        return new Promise(resolve => {
+            const finish = (result) => { observer.disconnect(); clearTimeout(timer); resolve(result); };
+            const observer = new MutationObserver(() => { const r = check(); if (r) finish(r); });
+            observer.observe(document.body, { childList: true, subtree: true, characterData: true });
+            const timer = setTimeout(() => finish({ status: 'timeout', text: '' }), timeoutMs);
+        });
+    }
+    """
 
-    def check_result(self, page):
+    async def check_result(self, page):
         logging.info("检查预约结果...")
         try:
-            success_locator = page.locator('text=/预约成功|提交成功/').first
-            success_locator.wait_for(state='visible', timeout=4000)
-            logging.info(f"✅ 预约成功！消息: '{success_locator.text_content(timeout=500).strip()}'")
+            result = await page.evaluate(self._RESULT_RACE_JS, {
+                'successPattern': self._success_re.pattern,
+                'failurePattern': self._failure_re.pattern,
+                'timeoutMs': 4000,
+            })
+        except Exception as e:
+            logging.warning(f"结果检测执行失败: {str(e).split(chr(10))[0]}")
+            return False
+
+        if result['status'] == 'success':
+            logging.info(f"✅ 预约成功！消息: '{result['text'].strip()}'")
             return True
-        except Exception:
-            logging.info("未检测到成功信息，正在检查是否存在错误提示...")
-            try:
-                error_locator = page.locator('text=/失败|错误|超限|频繁|取消.*次|已达上限/').first
-                error_locator.wait_for(state='visible', timeout=1000)
-                error_message = error_locator.text_content(timeout=500)
-                logging.error(f"❌ 预约失败，检测到错误信息: '{error_message.strip()}'")
-                return False
-            except Exception:
-                logging.warning("⚠️ 预约结果不确定，未找到明确的成功或失败信息。")
-                return False
+        if result['status'] == 'fail':
+            logging.error(f"❌ 预约失败，检测到错误信息: '{result['text'].strip()}'")
+            return False
+        logging.warning("⚠️ 预约结果不确定，未找到明确的成功或失败信息。")
+        return False
 
-    def go_to_payment(self, page):
+    async def go_to_payment(self, page):
         logging.info("尝试点击 '去支付'...")
         payment_selectors = ['text="去支付"']
-        if self.wait_and_click(page, payment_selectors, timeout=5000):
+        if await self.wait_and_click(page, payment_selectors, timeout=5000):
             logging.info("已点击 '去支付'。请手动完成支付。")
             return True
         else:
             logging.warning("'去支付' 按钮未找到或无法点击。请手动处理。")
             return False
 
-    def run(self):
-        """总调度函数，编排两阶段执行流程"""
-        with sync_playwright() as p:
-            browser = p.chromium.launch(
-                headless=self.is_ci,
-                args=['--disable-blink-features=AutomationControlled', '--no-sandbox']
-            )
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 MicroMessenger/8.0.15(0x18000f2e) NetType/WIFI Language/zh_CN",
-                viewport={"width": 390, "height": 844},
-                locale="zh-CN",
-                ignore_https_errors=True,
-            )
-            page = context.new_page()
-            
+    async def _launch(self, p):
+        """启动浏览器并建好 context/首页，返回 (browser, page)"""
+        # 裁掉与抢票无关的浏览器后台工作，缩短冷启动和每帧开销
+        launch_args = [
+            '--disable-blink-features=AutomationControlled',
+            '--no-sandbox',
+            '--disable-dev-shm-usage',
+            '--disable-gpu',
+            '--disable-background-networking',
+            '--disable-renderer-backgrounding',
+            '--disable-background-timer-throttling',
+            '--disable-features=TranslateUI',
+        ]
+        if self.is_ci:
+            launch_args += ['--no-zygote', '--single-process']
+        try:
+            # 系统 Chrome 带 AOT 编译的 V8 快照，启动更快；没有就用自带 Chromium
+            browser = await p.chromium.launch(
+                headless=self.is_ci, channel='chrome', args=launch_args)
+        except Exception:
+            logging.info("未找到系统 Chrome，回退到自带 Chromium")
+            browser = await p.chromium.launch(headless=self.is_ci, args=launch_args)
+        state_path = self._saved_state_path()
+        self._state_loaded = state_path is not None
+        context = await browser.new_context(
+            user_agent="Mozilla/5.0 (iPhone; CPU iPhone OS 15_0 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148 MicroMessenger/8.0.15(0x18000f2e) NetType/WIFI Language/zh_CN",
+            viewport={"width": 390, "height": 844},
+            locale="zh-CN",
+            ignore_https_errors=True,
+            storage_state=state_path,
+        )
+        await context.route("**/*", self._block_heavy_resources)
+        page = await context.new_page()
+        return browser, page
+
+    async def warmup(self, page):
+        """完成 Phase 1（登录、导航、预开页签、预热），可远早于目标时间调用"""
+        await self._login_and_prepare(page)
+
+    async def keep_alive(self, page, stop_before=30.0):
+        """长驻模式下的保活：每 60 秒触达一次页面，防止会话闲置过期；
+        发现登录态失效则重走 Phase 1。距目标时间不足 stop_before 秒时返回。"""
+        if self.is_ci:
+            return
+        while True:
+            now = datetime.now()
+            remaining = (self._next_target(now) - now).total_seconds()
+            if remaining <= stop_before:
+                return
+            await asyncio.sleep(min(60.0, remaining - stop_before))
+            try:
+                await page.evaluate("() => document.title")
+                if await page.locator('text="校外人员登录"').first.is_visible():
+                    logging.warning("检测到登录态失效，重新执行 Phase 1...")
+                    await self._close_court_pages(page)
+                    await self._login_and_prepare(page)
+            except Exception as e:
+                logging.warning(f"保活触达失败: {str(e).split(chr(10))[0]}")
+
+    async def snatch(self, page):
+        """等到目标时间并执行 Phase 2，返回是否抢到"""
+        await self.wait_until_target_time()
+
+        booking_start_time = time.time()
+        success = await self._execute_booking(page)
+
+        booking_time = time.time() - booking_start_time
+        logging.info(f"关键预定耗时: {booking_time:.3f}秒")
+        return success
+
+    async def run(self, stay_alive=False):
+        """总调度函数：warmup → (可选保活) → snatch。
+
+        stay_alive=True 供守护/定时任务模式使用：提前启动（如 08:00），
+        浏览器跨等待期常驻保活，临近目标时间才进入抢票，免去当天冷启动。
+        """
+        async with async_playwright() as p:
+            browser, page = await self._launch(p)
+
             try:
-                self._login_and_prepare(page)
-                self.wait_until_target_time()
-                
-                booking_start_time = time.time()
-                success = self._execute_booking(page)
-                
-                booking_time = time.time() - booking_start_time
-                logging.info(f"关键预定耗时: {booking_time:.3f}秒")
-                return success
-                
+                await self.warmup(page)
+                if stay_alive:
+                    await self.keep_alive(page)
+                return await self.snatch(page)
+
             except Exception as e:
                 logging.error(f"❌ 预约流程发生意外错误: {str(e)}")
                 timestamp = int(time.time())
                 screenshot_path = f"error_{timestamp}.png"
                 try:
-                    page.screenshot(path=screenshot_path, full_page=True)
+                    await page.screenshot(path=screenshot_path, full_page=True)
                     logging.info(f"错误截图已保存: {screenshot_path}")
                 except Exception as ex:
                     logging.error(f"无法保存截图: {ex}")
@@ -263,7 +609,7 @@ class LightningFastBooking:
                 if not self.is_ci:
                     print("\n💡 浏览器将保持打开状态，您可以手动查看预约详情")
                     input("💡 按 Enter 键关闭浏览器...")
-                browser.close()
+                await browser.close()
 
 if __name__ == "__main__":
     logging.info("🚀 启动两阶段预约脚本...")
@@ -272,9 +618,10 @@ if __name__ == "__main__":
     logging.info(f"🎯  目标场地: {booking.venue_name} - {booking.courts}")
     logging.info(f"ช่วง  目标时段: {booking.time_slots}")
     logging.info("="*50)
-    
-    success = booking.run()
-    
+
+    # --stay-alive: 守护模式，提前启动后浏览器常驻保活直到临近目标时间
+    success = asyncio.run(booking.run(stay_alive='--stay-alive' in sys.argv))
+
     if success:
         logging.info("🎉 预约流程全部完成！")
     else: